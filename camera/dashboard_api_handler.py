@@ -1,6 +1,9 @@
+import queue
+import threading
 import requests
 from datetime import datetime
 import os
+import time
 import cv2
 from django.conf import settings
 
@@ -10,25 +13,42 @@ class DashboardAPIHandler:
 
     Attributes:
         api_url (str): The base URL of the dashboard API.
+        log_queue (queue.Queue): A bounded queue of log payloads waiting to be posted by the background sender.
+        log_timeout (float): Seconds a log post may take before it is abandoned, so a stalled
+                             dashboard cannot block the background sender forever.
+        dropped_logs (int): The number of log entries dropped because the queue was full.
     """
 
-    def __init__(self, api_url):
+    # Minimum seconds between reports of dropped log entries
+    DROPPED_LOG_REPORT_INTERVAL = 60
+
+    def __init__(self, api_url, log_timeout=5):
         """
         Initializes the DashboardAPIHandler with the provided API URL.
 
         Args:
             api_url (str): The base URL of the dashboard API.
+            log_timeout (float): Seconds a log post may take. Default is 5.
         """
         self.api_url = api_url
+        self.log_timeout = log_timeout
+        self.log_queue = queue.Queue(maxsize=256)
+        self.dropped_logs = 0
+        self._last_drop_report = None
+        self._log_thread = None
+        self._log_thread_lock = threading.Lock()
 
-    def send_log(self, event_type, description, extra_data=None):
+    def _build_log_payload(self, event_type, description, extra_data=None):
         """
-        Sends a log entry to the dashboard API.
+        Builds a log entry payload, timestamped now.
 
         Args:
             event_type (str): The type of the event (e.g., "info", "error").
             description (str): A description of the event.
             extra_data (dict, optional): Additional data to include in the log. Defaults to None.
+
+        Returns:
+            dict: The log entry payload.
         """
         payload = {
             'timestamp': datetime.now().isoformat(),
@@ -37,9 +57,62 @@ class DashboardAPIHandler:
         }
         if extra_data is not None:
             payload['extra_data'] = extra_data
+        return payload
+
+    def send_log(self, event_type, description, extra_data=None):
+        """
+        Sends a log entry to the dashboard API.
+
+        Args:
+            event_type (str): The type of the event (e.g., "info", "error").
+            description (str): A description of the event.
+            extra_data (dict, optional): Additional data to include in the log. Defaults to None.
+        """
+        self._post_log(self._build_log_payload(event_type, description, extra_data))
+
+    def send_log_async(self, event_type, description, extra_data=None):
+        """
+        Queues a log entry to be sent to the dashboard API by a background thread,
+        so the caller never waits on the network. The entry is timestamped now, and
+        dropped if the queue is full because the dashboard is slow or unreachable.
+
+        Args:
+            event_type (str): The type of the event (e.g., "info", "error").
+            description (str): A description of the event.
+            extra_data (dict, optional): Additional data to include in the log. Defaults to None.
+        """
+        if self._log_thread is None:
+            with self._log_thread_lock:
+                if self._log_thread is None:
+                    self._log_thread = threading.Thread(target=self._log_sender_loop, daemon=True)
+                    self._log_thread.start()
+        try:
+            self.log_queue.put_nowait(self._build_log_payload(event_type, description, extra_data))
+        except queue.Full:
+            # Count every dropped entry, but only report them once per interval
+            self.dropped_logs += 1
+            now = time.monotonic()
+            if (self._last_drop_report is None
+                    or now - self._last_drop_report >= self.DROPPED_LOG_REPORT_INTERVAL):
+                self._last_drop_report = now
+                print(f"Dashboard log queue full, {self.dropped_logs} log entries dropped so far")
 
+    def _log_sender_loop(self):
+        """
+        Background task that posts queued log entries to the dashboard API.
+        """
+        while True:
+            self._post_log(self.log_queue.get())
+
+    def _post_log(self, payload):
+        """
+        Posts a log entry payload to the dashboard API.
+
+        Args:
+            payload (dict): The log entry payload.
+        """
         try:
-            response = requests.post(f"{self.api_url}/log_event/", json=payload)
+            response = requests.post(f"{self.api_url}/log_event/", json=payload, timeout=self.log_timeout)
             response.raise_for_status()
             # print("Log sent successfully")
         except requests.exceptions.RequestException as e:
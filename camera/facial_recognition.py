@@ -2,15 +2,41 @@ import cv2
 import dlib
 import numpy as np
 from tensorflow.keras.preprocessing import image
-from tensorflow.keras.applications.resnet50 import preprocess_input, ResNet50
+from tensorflow.keras.applications import mobilenet_v2, resnet50
 from tensorflow.keras.models import Model
-from scipy.spatial import distance
 from mtcnn.mtcnn import MTCNN
 import os
+import hashlib
+import threading
 from datetime import datetime
 from django.conf import settings
 from .models import Face
 
+# Supported feature extractor backbones, as (constructor keyword arguments, model
+# class, matching preprocess_input). MobileNetV2 at alpha 0.5 needs about a tenth
+# of ResNet50's compute per face.
+BACKBONES = {
+    'mobilenet_v2': ({'alpha': 0.5}, mobilenet_v2.MobileNetV2, mobilenet_v2.preprocess_input),
+    'resnet50': ({}, resnet50.ResNet50, resnet50.preprocess_input),
+}
+
+_mtcnn = None
+_mtcnn_lock = threading.Lock()
+
+def get_mtcnn():
+    """
+    Returns the process-wide MTCNN detector, creating it on first use. Building one
+    loads the P-Net, R-Net and O-Net weights, so the cameras and the views share it.
+
+    Returns:
+        MTCNN: The shared detector.
+    """
+    global _mtcnn
+    with _mtcnn_lock:
+        if _mtcnn is None:
+            _mtcnn = MTCNN()
+        return _mtcnn
+
 class FacialRecognition:
     """
     A class used to perform facial recognition tasks, including face detection,
@@ -18,23 +44,75 @@ class FacialRecognition:
 
     Attributes:
         detector (MTCNN): The face detector used to detect faces in images.
-        base_model (ResNet50): The base ResNet50 model for feature extraction.
-        model (Model): The final feature extractor model.
+        face_cascade (cv2.CascadeClassifier): A Haar cascade that screens frames before MTCNN runs, or None if disabled.
+        backbone (str): The name of the feature extractor backbone, a key of BACKBONES.
+        preprocess_input (callable): The input preprocessing function matching the backbone.
+        base_model (Model): The base backbone model for feature extraction, or None when ONNX Runtime is used.
+        model (Model): The final feature extractor model, or None when ONNX Runtime is used.
+        feature_extractor_id (str): Identifies the extractor's weights, so cached known-face features are only reused with the same extractor.
+        onnx_session (onnxruntime.InferenceSession): The ONNX Runtime session for feature extraction, if an ONNX model is configured.
+        input_size (int): The side length of the square face crops fed to the feature extractor.
         known_faces_features (list): List of features for known faces.
         known_faces_labels (list): List of labels corresponding to the known faces.
+        known_faces_matrix (ndarray): The known face features stacked into a float32 (faces, features) array for matching.
+        known_faces_sqnorm (ndarray): The squared norm of each row of known_faces_matrix.
         shape_predictor (dlib.shape_predictor): Dlib's shape predictor for face alignment.
+        faces_seen_dir (str): The directory where recognized face images are saved.
     """
 
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process-wide FacialRecognition instance, creating it on first use.
+        Building one loads the detector and feature extractor weights and indexes the
+        known faces, so all cameras share a single instance.
+
+        Returns:
+            FacialRecognition: The shared instance.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
     def __init__(self):
         """
         Initializes the FacialRecognition class, setting up the face detector,
         feature extractor, and loading known faces and their features.
         """
-        self.detector = MTCNN()
-        self.base_model = ResNet50(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
-        self.model = self._build_feature_extractor(self.base_model)
+        self.detector = get_mtcnn()
+        self.face_cascade = self._load_face_cascade() if settings.FACE_DETECTION_PREFILTER else None
+        self._cascade_lock = threading.Lock()  # detectMultiScale is not safe to call concurrently
+        self.onnx_session = self._load_onnx_session(settings.FACE_FEATURES_ONNX_MODEL)
+        self.input_size = settings.FACE_FEATURES_INPUT_SIZE
+        self.backbone = settings.FACE_FEATURES_BACKBONE
+        backbone_kwargs, backbone_class, self.preprocess_input = BACKBONES[self.backbone]
+        if self.onnx_session is None:
+            self.base_model = backbone_class(weights='imagenet', include_top=False,
+                                             input_shape=(self.input_size, self.input_size, 3),
+                                             **backbone_kwargs)
+            self.model = self._build_feature_extractor(self.base_model)
+            head_weights_path = self._load_or_save_head_weights(self.model)
+            self.feature_extractor_id = f"keras:{head_weights_path}:{self._mtime(head_weights_path)}"
+        else:
+            self.base_model = None
+            self.model = None
+            model_path = settings.FACE_FEATURES_ONNX_MODEL
+            self.feature_extractor_id = (f"onnx:{model_path}:{self._mtime(model_path)}:"
+                                         f"{self.onnx_session.get_providers()[0]}:{settings.FACE_FEATURES_ONNX_QUANTIZE}")
+            # An exported model with a fixed (N, H, W, C) input dictates the crop size
+            input_height = self.onnx_session.get_inputs()[0].shape[1]
+            if isinstance(input_height, int):
+                self.input_size = input_height
         self.known_faces_features = []
         self.known_faces_labels = []
+        self.known_faces_matrix = None
+        self.known_faces_sqnorm = None
+        self.faces_seen_dir = os.path.join(settings.MEDIA_ROOT, 'faces_seen')
+        os.makedirs(self.faces_seen_dir, exist_ok=True)
         
         # Load the shape predictor
         shape_predictor_path = os.path.join(settings.MODEL_DIR, 'shape_predictor_68_face_landmarks.dat')
@@ -45,12 +123,78 @@ class FacialRecognition:
         
         self.load_known_faces()
 
+    def _load_face_cascade(self):
+        """
+        Loads OpenCV's frontal face Haar cascade, used as a cheap screen so MTCNN
+        only runs on frames that may contain a face.
+
+        Returns:
+            cv2.CascadeClassifier: The loaded cascade, or None if it could not be loaded.
+        """
+        cascade_path = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        cascade = cv2.CascadeClassifier(cascade_path)
+        if cascade.empty():
+            print(f"Could not load face cascade from {cascade_path}, running MTCNN on every frame.")
+            return None
+        return cascade
+
+    def _face_candidates(self, frame):
+        """
+        Screens a frame with the Haar cascade for regions that may contain a face.
+
+        Args:
+            frame (ndarray): The full-size BGR frame.
+
+        Returns:
+            ndarray: The candidate (x, y, w, h) rectangles, possibly empty.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Scale the smallest face to the frame, 30 px on the 240-line capture frame
+        min_side = max(frame.shape[0] // 8, 20)
+        with self._cascade_lock:
+            return self.face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5,
+                                                      minSize=(min_side, min_side))
+
+    def _detect_faces_in_regions(self, frame, regions, confidence_threshold=0.70):
+        """
+        Runs MTCNN on the cascade's candidate regions only, each widened by half its
+        size on every side so MTCNN sees the whole head.
+
+        Args:
+            frame (ndarray): The full-size BGR frame.
+            regions (ndarray): The candidate (x, y, w, h) rectangles from the cascade.
+            confidence_threshold (float): Minimum confidence to consider a detection valid.
+
+        Returns:
+            list: A list of detected faces with coordinates in the full frame and confidence levels.
+        """
+        frame_height, frame_width = frame.shape[:2]
+        faces = []
+        for x, y, w, h in regions:
+            x0, y0 = max(x - w // 2, 0), max(y - h // 2, 0)
+            x1, y1 = min(x + w + w // 2, frame_width), min(y + h + h // 2, frame_height)
+            # MTCNN was trained on RGB images
+            region = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+            for face in self.detector.detect_faces(region):
+                if face['confidence'] < confidence_threshold:
+                    continue
+                face_x, face_y, face_w, face_h = face['box']
+                face_x, face_y = face_x + x0, face_y + y0
+                # Widened regions can overlap, so only keep a face in the region
+                # whose cascade rectangle contains its centre
+                center_x, center_y = face_x + face_w // 2, face_y + face_h // 2
+                if not (x <= center_x < x + w and y <= center_y < y + h):
+                    continue
+                face['box'] = [face_x, face_y, face_w, face_h]
+                faces.append(face)
+        return faces
+
     def _build_feature_extractor(self, base_model):
         """
-        Builds a feature extractor model on top of the base ResNet50 model.
+        Builds a feature extractor model on top of the base backbone model.
 
         Args:
-            base_model (ResNet50): The base model to extend.
+            base_model (Model): The base model to extend.
 
         Returns:
             Model: The constructed feature extractor model.
@@ -62,6 +206,97 @@ class FacialRecognition:
         predictions = Dense(128, activation='relu')(x)
         return Model(inputs=base_model.input, outputs=predictions)
 
+    def _load_or_save_head_weights(self, model):
+        """
+        Loads the weights of the dense layers on top of the backbone from the model
+        directory, or saves them there on first use. The head is randomly initialized,
+        so keeping its weights makes features comparable across restarts.
+
+        Args:
+            model (Model): The feature extractor model built by _build_feature_extractor.
+
+        Returns:
+            str: The path of the head weights file.
+        """
+        head_layers = model.layers[-2:]
+        path = os.path.join(settings.MODEL_DIR, f"face_head_{self.backbone}_{self.input_size}.npz")
+        if os.path.exists(path):
+            with np.load(path) as data:
+                weights = [data[f"arr_{i}"] for i in range(len(data.files))]
+            offset = 0
+            for layer in head_layers:
+                count = len(layer.get_weights())
+                layer.set_weights(weights[offset:offset + count])
+                offset += count
+        else:
+            try:
+                np.savez(path, *[w for layer in head_layers for w in layer.get_weights()])
+            except OSError as e:
+                print(f"Could not save face feature head weights to {path}: {e}")
+        return path
+
+    @staticmethod
+    def _mtime(path):
+        """
+        Returns the modification time of a file, or None if it does not exist.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            int: The modification time in nanoseconds, or None.
+        """
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_onnx_session(self, model_path):
+        """
+        Loads the ONNX export of the feature extractor with ONNX Runtime, preferring
+        TensorRT (in FP16), then CUDA, then the CPU. When only the CPU is available the
+        model is dynamically quantized to INT8 first, unless disabled in settings; if
+        quantizing or loading the quantized model fails, the FP32 model is used instead.
+
+        Args:
+            model_path (str): The path of the ONNX model file.
+
+        Returns:
+            onnxruntime.InferenceSession: The inference session, or None if no model file exists.
+        """
+        if not model_path or not os.path.exists(model_path):
+            return None
+        import onnxruntime as ort
+        available = ort.get_available_providers()
+        providers = []
+        if 'TensorrtExecutionProvider' in available:
+            providers.append(('TensorrtExecutionProvider', {'trt_fp16_enable': True}))
+        if 'CUDAExecutionProvider' in available:
+            providers.append('CUDAExecutionProvider')
+        providers.append('CPUExecutionProvider')
+
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = settings.FACE_FEATURES_ONNX_THREADS
+
+        session = None
+        if providers == ['CPUExecutionProvider'] and settings.FACE_FEATURES_ONNX_QUANTIZE:
+            quantized_path = os.path.splitext(model_path)[0] + '.int8.onnx'
+            try:
+                if (not os.path.exists(quantized_path)
+                        or os.path.getmtime(quantized_path) < os.path.getmtime(model_path)):
+                    from onnxruntime.quantization import quantize_dynamic, QuantType
+                    # The CPU provider only implements ConvInteger for uint8 weights
+                    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QUInt8)
+                session = ort.InferenceSession(quantized_path, sess_options=session_options,
+                                               providers=providers)
+                model_path = quantized_path
+            except Exception as e:
+                print(f"Warning: could not use the INT8 face feature model ({e}), falling back to FP32")
+        if session is None:
+            session = ort.InferenceSession(model_path, sess_options=session_options, providers=providers)
+        print(f"Face feature extractor loaded from {model_path} using {session.get_providers()}")
+        return session
+
     def _preprocess_image(self, img):
         """
         Preprocesses the image for feature extraction.
@@ -74,10 +309,10 @@ class FacialRecognition:
         """
         if img is None or img.size == 0:
             return None
-        img = cv2.resize(img, (224, 224))
+        img = cv2.resize(img, (self.input_size, self.input_size))
         img_array = np.array(img, dtype='float32')
         img_array = np.expand_dims(img_array, axis=0)
-        img_array = preprocess_input(img_array)
+        img_array = self.preprocess_input(img_array)
         return img_array
 
     def _extract_features(self, img_array):
@@ -92,16 +327,36 @@ class FacialRecognition:
         """
         if img_array is None:
             return None
-        features = self.model.predict(img_array)
-        return features.flatten()
+        return self._extract_features_batch(img_array)[0]
 
-    def _detect_faces(self, img, confidence_threshold=0.70):
+    def _extract_features_batch(self, img_batch):
+        """
+        Extracts features for a stack of preprocessed face images in a single
+        forward pass.
+
+        Args:
+            img_batch (ndarray): Preprocessed images stacked along axis 0.
+
+        Returns:
+            ndarray: One feature vector per image, shape (N, features).
+        """
+        if self.onnx_session is not None:
+            input_name = self.onnx_session.get_inputs()[0].name
+            features = self.onnx_session.run(None, {input_name: img_batch})[0]
+        else:
+            # Calling the model directly skips predict()'s per-call dataset and
+            # callback setup, which dominates for the few faces in one batch
+            features = self.model(img_batch, training=False).numpy()
+        return features.reshape(len(img_batch), -1)
+
+    def _detect_faces(self, img, confidence_threshold=0.70, resized=False):
         """
         Detects faces in an image using the MTCNN detector.
 
         Args:
-            img (ndarray): The input image.
+            img (ndarray): The input BGR image.
             confidence_threshold (float): Minimum confidence to consider a detection valid.
+            resized (bool): Whether img has already been downsampled to 160x120.
 
         Returns:
             list: A list of detected faces with coordinates and confidence levels.
@@ -110,13 +365,17 @@ class FacialRecognition:
             print("Error: The image provided for face detection is empty or None.")
             return []  # Return an empty list if the image is invalid
 
-        try:
-            small_img = cv2.resize(img, (160, 120))
-        except cv2.error as e:
-            print(f"Error resizing image: {e}")
-            return []  # Return an empty list if resizing fails
-
-        faces = self.detector.detect_faces(small_img)
+        if resized:
+            small_img = img
+        else:
+            try:
+                small_img = cv2.resize(img, (160, 120))
+            except cv2.error as e:
+                print(f"Error resizing image: {e}")
+                return []  # Return an empty list if resizing fails
+
+        # MTCNN was trained on RGB images
+        faces = self.detector.detect_faces(cv2.cvtColor(small_img, cv2.COLOR_BGR2RGB))
         for face in faces:
             face['box'] = [int(coordinate * 2) for coordinate in face['box']]
         filtered_faces = [face for face in faces if face['confidence'] >= confidence_threshold]
@@ -163,11 +422,30 @@ class FacialRecognition:
 
     def load_known_faces(self):
         """
-        Loads and preprocesses known faces from the specified directory.
+        Loads and preprocesses known faces from the specified directory. The
+        features are cached next to the images and reused as long as the image
+        files and the feature extractor are unchanged, which skips face detection
+        and feature extraction at startup.
         """
         known_faces_dir = settings.KNOWN_FACES_DIR
-        for filename in os.listdir(known_faces_dir):
-            if filename.endswith(".jpg") or filename.endswith(".jpeg") or filename.endswith(".png"):
+        filenames = sorted(filename for filename in os.listdir(known_faces_dir)
+                           if filename.endswith(".jpg") or filename.endswith(".jpeg") or filename.endswith(".png"))
+        cache_key = hashlib.sha1(repr((
+            [(filename, self._mtime(os.path.join(known_faces_dir, filename))) for filename in filenames],
+            self.backbone, self.input_size, self.feature_extractor_id,
+        )).encode()).hexdigest()
+        cache_path = os.path.join(known_faces_dir, '.features_cache.npz')
+
+        try:
+            with np.load(cache_path) as data:
+                if str(data['key']) == cache_key:
+                    self.known_faces_features = list(data['features'])
+                    self.known_faces_labels = [str(label) for label in data['labels']]
+        except (OSError, KeyError, ValueError):
+            pass  # No usable cache, extract the features below
+
+        if not self.known_faces_labels:
+            for filename in filenames:
                 img_path = os.path.join(known_faces_dir, filename)
                 label = os.path.splitext(filename)[0]
                 img = cv2.imread(img_path)
@@ -177,6 +455,44 @@ class FacialRecognition:
                     self.known_faces_labels.append(label)
                 else:
                     print(f"Failed to extract features for known face: {label}")
+            if self.known_faces_features:
+                try:
+                    np.savez(cache_path, key=cache_key,
+                             features=np.asarray(self.known_faces_features, dtype=np.float32),
+                             labels=np.array(self.known_faces_labels))
+                except OSError as e:
+                    print(f"Could not save known face features cache: {e}")
+
+        if self.known_faces_features:
+            self.known_faces_matrix = np.asarray(self.known_faces_features, dtype=np.float32)
+            self.known_faces_sqnorm = np.einsum('ij,ij->i', self.known_faces_matrix, self.known_faces_matrix)
+
+    def _match_faces(self, features_batch, recognition_threshold):
+        """
+        Matches a batch of face features against the known faces by Euclidean distance.
+
+        Args:
+            features_batch (ndarray): One feature vector per face, shape (N, features).
+            recognition_threshold (float): The maximum distance for a face to be recognized.
+
+        Returns:
+            list: The label of the nearest known face for each input face, or 'Unknown'.
+        """
+        if self.known_faces_matrix is None:
+            return ['Unknown'] * len(features_batch)
+        # (N, K) squared distances via |f|^2 - 2 f.k + |k|^2, so the bulk of the work
+        # is a single matrix product; the square root is only taken for the nearest match
+        features_batch = features_batch.astype(np.float32)
+        sq_distances = (np.einsum('ij,ij->i', features_batch, features_batch)[:, None]
+                        - 2 * features_batch @ self.known_faces_matrix.T
+                        + self.known_faces_sqnorm[None, :])
+        nearest = np.argmin(sq_distances, axis=1)
+        labels = []
+        for i, known_index in enumerate(nearest):
+            min_distance = np.sqrt(max(sq_distances[i, known_index], 0))
+            print(f"Nearest known face {self.known_faces_labels[known_index]} at distance {min_distance}")
+            labels.append(self.known_faces_labels[known_index] if min_distance <= recognition_threshold else 'Unknown')
+        return labels
 
     def _preprocess_and_extract(self, img):
         """
@@ -199,46 +515,79 @@ class FacialRecognition:
             return features
         return None
 
-    def recognize_faces(self, frame, recognition_threshold=7):
+    def recognize_faces(self, frame, recognition_threshold=None):
         """
         Recognizes faces in a given frame by comparing them to known faces.
 
         Args:
             frame (ndarray): The input frame to recognize faces in.
-            recognition_threshold (float): The threshold for face recognition.
+            recognition_threshold (float): The threshold for face recognition. Defaults to settings.FACE_RECOGNITION_THRESHOLD.
 
         Returns:
             list: A list of recognized faces with labels and coordinates.
         """
-        gray_image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray_image_3ch = cv2.cvtColor(gray_image, cv2.COLOR_GRAY2BGR)
-        faces = self._detect_faces(gray_image_3ch)
-        recognized_faces = []
-        for face in faces:
-            x, y, width, height = face['box']
-            if x < 0 or y < 0 or x + width > frame.shape[1] or y + height > frame.shape[0]:
-                continue
-            aligned_face = self._align_face(frame, (x, y, width, height))
-            face_array = self._preprocess_image(aligned_face)
-            if face_array is None:
-                continue
-            features = self._extract_features(face_array)
-            min_distance = float('inf')
-            label = 'Unknown'
-            for known_features, known_label in zip(self.known_faces_features, self.known_faces_labels):
-                dist = distance.euclidean(features, known_features)
-                print(f"Distance to known face {known_label}: {dist}")
-                if dist < min_distance:
-                    min_distance = dist
-                    label = known_label
-            if min_distance > recognition_threshold:
-                label = 'Unknown'
+        return self.recognize_faces_batch([frame], recognition_threshold)[0]
+
+    def recognize_faces_batch(self, frames, recognition_threshold=None, small_frames=None, prefilter=True):
+        """
+        Recognizes faces in several frames at once. Faces are detected per frame,
+        then every face in the batch goes through the feature extractor in a
+        single call so the model overhead is paid once per batch.
+
+        Args:
+            frames (list): The input frames to recognize faces in.
+            recognition_threshold (float): The threshold for face recognition. Defaults to settings.FACE_RECOGNITION_THRESHOLD.
+            small_frames (list): The frames already downsampled to 160x120, with None for
+                                 any frame that has not been; used for face detection.
+            prefilter (bool): Whether to screen the frames with the Haar cascade and run MTCNN
+                              only on its candidate regions. Pass False now and then, so faces
+                              the frontal cascade misses (profile, tilted, low light) are
+                              still found by MTCNN on the whole frame.
+
+        Returns:
+            list: One list of recognized faces per input frame, in input order.
+        """
+        if recognition_threshold is None:
+            recognition_threshold = settings.FACE_RECOGNITION_THRESHOLD
+        results = [[] for _ in frames]
+        candidates = []  # (frame index, face, preprocessed face array)
+        for index, frame in enumerate(frames):
+            if prefilter and self.face_cascade is not None:
+                # Most movement frames show no face, and the cascade rules those out far
+                # more cheaply than MTCNN's image pyramid; MTCNN then only sees the candidates
+                regions = self._face_candidates(frame)
+                if len(regions) == 0:
+                    continue
+                faces = self._detect_faces_in_regions(frame, regions)
+            else:
+                # Detection runs on the downsampled frame, in colour as MTCNN expects
+                small_frame = small_frames[index] if small_frames is not None else None
+                if small_frame is None:
+                    small_frame = cv2.resize(frame, (160, 120), interpolation=cv2.INTER_AREA)
+                faces = self._detect_faces(small_frame, resized=True)
+            for face in faces:
+                x, y, width, height = face['box']
+                if x < 0 or y < 0 or x + width > frame.shape[1] or y + height > frame.shape[0]:
+                    continue
+                aligned_face = self._align_face(frame, (x, y, width, height))
+                face_array = self._preprocess_image(aligned_face)
+                if face_array is None:
+                    continue
+                candidates.append((index, face, face_array))
+
+        if not candidates:
+            return results
+
+        features_batch = self._extract_features_batch(np.concatenate([c[2] for c in candidates]))
+        labels = self._match_faces(features_batch, recognition_threshold)
+        for (index, face, _), label in zip(candidates, labels):
             face['label'] = label
-            recognized_faces.append(face)
+            results[index].append(face)
 
-            self.save_face_image(frame[y:y + height, x:x + width], face['label'])
+            x, y, width, height = face['box']
+            self.save_face_image(frames[index][y:y + height, x:x + width], face['label'])
 
-        return recognized_faces
+        return results
 
     def save_face_image(self, face_img, label):
         """
@@ -248,13 +597,9 @@ class FacialRecognition:
             face_img (ndarray): The face image to save.
             label (str): The label of the face (e.g., name of the person).
         """
-        faces_seen_dir = os.path.join(settings.MEDIA_ROOT, 'faces_seen')
-        if not os.path.exists(faces_seen_dir):
-            os.makedirs(faces_seen_dir)
-
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{label}_{timestamp}.jpg"
-        filepath = os.path.join(faces_seen_dir, filename)
+        filepath = os.path.join(self.faces_seen_dir, filename)
 
         cv2.imwrite(filepath, face_img)
         print(f"Face image saved: {filepath}")
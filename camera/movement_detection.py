@@ -4,53 +4,110 @@ import numpy as np
 class MovementDetection:
     """
     A class for detecting movement in video frames by comparing the difference between
-    the current frame and the previous frame.
+    the current frame and the previous frame. Frames are downsampled before comparison,
+    and bounding boxes are scaled back to the coordinates of the input frame.
 
     Attributes:
-        previous_frame (ndarray): The grayscale image of the previous frame.
+        previous_frame (ndarray): The downsampled, blurred grayscale previous frame.
+        detection_size (tuple): The (width, height) frames are downsampled to before comparison.
+        min_area (int): The minimum contour area, in input frame pixels, counted as movement.
     """
 
-    def __init__(self):
+    def __init__(self, detection_size=(160, 120), min_area=500):
         """
         Initializes the MovementDetection class with no previous frame.
+
+        Args:
+            detection_size (tuple): The (width, height) to downsample frames to. Default is (160, 120).
+            min_area (int): The minimum contour area, in input frame pixels, counted as movement. Default is 500.
         """
         self.previous_frame = None
+        self.detection_size = detection_size
+        self.min_area = min_area
 
-    def detect_movement(self, frame):
+        # Scratch buffers reused on every call via dst=, so detection does not
+        # allocate new images per frame
+        width, height = detection_size
+        self._small = np.empty((height, width, 3), np.uint8)
+        self._gray = np.empty((height, width), np.uint8)
+        self._blurred = np.empty((height, width), np.uint8)
+        self._diff = np.empty((height, width), np.uint8)
+        self._thresh = np.empty((height, width), np.uint8)
+        self._dilated = np.empty((height, width), np.uint8)
+
+    def detect_movement(self, frame, small_frame=None):
         """
         Detects movement in the current frame by comparing it to the previous frame.
 
         Args:
             frame (ndarray): The current video frame in which movement is to be detected.
+            small_frame (ndarray): The frame already downsampled to detection_size, if the
+                                   caller has one; otherwise it is computed here.
 
         Returns:
             tuple: A tuple containing a boolean indicating whether movement was detected,
                    and the bounding box (x, y, w, h) of the detected movement, or None if no movement is detected.
         """
-        # Convert the frame to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+        # Downsample before any per-pixel work; INTER_AREA averages the dropped pixels
+        small = small_frame
+        if small is None:
+            small = cv2.resize(frame, self.detection_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        scale_x = frame.shape[1] / self.detection_size[0]
+        scale_y = frame.shape[0] / self.detection_size[1]
+        min_area = self.min_area / (scale_x * scale_y)
+
+        # Convert the frame to grayscale; a box filter smooths noise at a fraction of the cost of a wide Gaussian
+        cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        gray = cv2.boxFilter(self._gray, -1, (7, 7), dst=self._blurred)
 
-        # If there is no previous frame, store the current frame and return no movement
+        # If there is no previous frame, keep the current one and return no movement.
+        # It takes over the blur buffer, so the next frame is blurred into a fresh one.
         if self.previous_frame is None:
             self.previous_frame = gray
+            self._blurred = np.empty_like(gray)
             return False, None
 
         # Compute the absolute difference between the current frame and the previous frame
-        frame_diff = cv2.absdiff(self.previous_frame, gray)
-        self.previous_frame = gray
+        frame_diff = cv2.absdiff(self.previous_frame, gray, dst=self._diff)
 
-        # Apply thresholding and dilation to highlight regions of movement
-        thresh = cv2.threshold(frame_diff, 25, 255, cv2.THRESH_BINARY)[1]
-        thresh = cv2.dilate(thresh, None, iterations=2)
+        # The current frame becomes the previous one; swapping the buffers avoids a copy
+        self.previous_frame, self._blurred = gray, self.previous_frame
+
+        # Apply thresholding and dilation to highlight regions of movement; a static
+        # scene leaves the mask empty, so the dilation and contour search are skipped
+        thresh = cv2.threshold(frame_diff, 25, 255, cv2.THRESH_BINARY, dst=self._thresh)[1]
+        if not cv2.countNonZero(thresh):
+            return False, None
+        thresh = cv2.dilate(thresh, None, dst=self._dilated, iterations=2)
+
+        # Every contour lies inside the bounding rectangle of the changed pixels, so if
+        # that rectangle is smaller than the minimum area no contour can reach it. The
+        # changed pixel count is not a safe bound, as contour areas include enclosed holes.
+        _, _, changed_w, changed_h = cv2.boundingRect(thresh)
+        if changed_w * changed_h < min_area:
+            return False, None
 
         # Find contours in the thresholded image
-        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         for contour in contours:
-            if cv2.contourArea(contour) < 500:
+            if cv2.contourArea(contour) < min_area:
                 continue
             (x, y, w, h) = cv2.boundingRect(contour)
-            return True, (x, y, w, h)
+            return True, (int(x * scale_x), int(y * scale_y), int(w * scale_x), int(h * scale_y))
 
         # Return no movement detected if no contours meet the criteria
         return False, None
+
+    @staticmethod
+    def annotate_image(image, movement_box, put_text=cv2.putText):
+        """
+        Draws the movement bounding box and label onto the image in place.
+
+        Args:
+            image (ndarray): The image frame to annotate.
+            movement_box (tuple): The bounding box (x, y, w, h) of the detected movement.
+            put_text (callable): The text drawing function, with the signature of cv2.putText.
+        """
+        x, y, w, h = movement_box
+        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 0, 255), 1)
+        put_text(image, "Movement Detected", (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 0, 255), 1)
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+class OverlayRenderer:
+    """
+    A class that draws text overlays onto video frames from cached sprites, so each
+    distinct label is rasterized with cv2.putText only once instead of on every frame.
+
+    Attributes:
+        max_cached (int): The maximum number of text sprites kept in the cache.
+        sprites (OrderedDict): Cached sprites keyed by text and font settings, least recently used first.
+        lock (threading.Lock): A lock guarding the sprite cache, as frames are rendered from several threads.
+    """
+
+    def __init__(self, max_cached=64):
+        """
+        Initializes the OverlayRenderer with an empty sprite cache.
+
+        Args:
+            max_cached (int): The maximum number of text sprites to keep. Default is 64.
+        """
+        self.max_cached = max_cached
+        self.sprites = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _get_sprite(self, text, font, font_scale, thickness):
+        """
+        Returns the cached sprite for the given text and font settings, rendering it on first use.
+
+        Args:
+            text (str): The text to render.
+            font (int): The OpenCV font face.
+            font_scale (float): The font scale factor.
+            thickness (int): The stroke thickness.
+
+        Returns:
+            tuple: A boolean glyph mask and the (x, y) offset of the text origin inside the mask.
+        """
+        key = (text, font, font_scale, thickness)
+        with self.lock:
+            sprite = self.sprites.get(key)
+            if sprite is not None:
+                self.sprites.move_to_end(key)
+                return sprite
+
+        (width, height), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+        pad = thickness + 2  # Room for strokes that overhang the nominal text box
+        canvas = np.zeros((height + baseline + 2 * pad, width + 2 * pad), np.uint8)
+        origin = (pad, pad + height)
+        cv2.putText(canvas, text, origin, font, font_scale, 255, thickness)
+        sprite = (canvas.astype(bool), origin)
+
+        with self.lock:
+            self.sprites[key] = sprite
+            if len(self.sprites) > self.max_cached:
+                self.sprites.popitem(last=False)
+        return sprite
+
+    def put_text(self, image, text, org, font, font_scale, color, thickness=1):
+        """
+        Draws text onto the image in place. Takes the same arguments as cv2.putText and
+        produces the same pixels for the default line type, but only copies the glyph
+        pixels of a cached sprite. Text that would run off the image is drawn with
+        cv2.putText, as its line clipping can differ from cropping the sprite.
+
+        Args:
+            image (ndarray): The image frame to draw on.
+            text (str): The text to draw.
+            org (tuple): The bottom-left corner (x, y) of the text.
+            font (int): The OpenCV font face.
+            font_scale (float): The font scale factor.
+            color (tuple): The text color in (B, G, R) format.
+            thickness (int): The stroke thickness. Default is 1.
+        """
+        mask, (origin_x, origin_y) = self._get_sprite(text, font, font_scale, thickness)
+        left = org[0] - origin_x
+        top = org[1] - origin_y
+
+        bottom = top + mask.shape[0]
+        right = left + mask.shape[1]
+        if left < 0 or top < 0 or right > image.shape[1] or bottom > image.shape[0]:
+            cv2.putText(image, text, org, font, font_scale, color, thickness)
+            return
+        image[top:bottom, left:right][mask] = color
@@ -7,14 +7,21 @@ from email import encoders
 import cv2
 from datetime import datetime
 from .models import EmailSettings
+from .movement_detection import MovementDetection
 import os
+import time
 
 class SendEmail:
     """
     A class responsible for handling the sending of email notifications, including
     attaching snapshots, detected faces, and video clips.
+
+    The SMTP connection is kept open between emails for up to smtp_keepalive
+    seconds, so back-to-back alerts skip the STARTTLS handshake and login.
     """
 
+    smtp_keepalive = 60  # Seconds an idle SMTP connection is reused for
+
     def __init__(self, request):
         """
         Initializes the SendEmail class with the user's request, setting up buffers
@@ -25,9 +32,12 @@ class SendEmail:
         """
         self.request = request
         self.alert_buffer = []
-        self.frame_buffer = []
+        self.frame_buffer = []  # (frame, movement_box) pairs; frames are unannotated
         self.detected_faces = []
         self.video_file_path = None  # Attribute to hold the video file path
+        self._smtp = None  # Open SMTP connection, reused between emails
+        self._smtp_key = None  # (server, port, user) the open connection was made for
+        self._smtp_last_used = 0
 
     def log_event(self, event):
         """
@@ -59,6 +69,52 @@ class SendEmail:
         """
         self.video_file_path = file_path
 
+    def _get_smtp_connection(self, smtp_server, smtp_port, smtp_user, smtp_password):
+        """
+        Returns a logged-in SMTP connection, reusing the open one when it was made
+        with the same settings, was used recently and still answers a NOOP.
+
+        Args:
+            smtp_server (str): The SMTP server address.
+            smtp_port (int): The SMTP server port.
+            smtp_user (str): The username for SMTP authentication.
+            smtp_password (str): The password for SMTP authentication.
+
+        Returns:
+            smtplib.SMTP: The SMTP connection.
+        """
+        key = (smtp_server, smtp_port, smtp_user)
+        if self._smtp is not None:
+            if key == self._smtp_key and time.monotonic() - self._smtp_last_used < self.smtp_keepalive:
+                try:
+                    if self._smtp.noop()[0] == 250:
+                        return self._smtp
+                except smtplib.SMTPException:
+                    pass
+            self._close_smtp_connection()
+
+        print("Connecting to SMTP server...")
+        server = smtplib.SMTP(smtp_server, smtp_port)
+        server.starttls()
+        print("Logging into SMTP server...")
+        server.login(smtp_user, smtp_password)
+        self._smtp = server
+        self._smtp_key = key
+        return server
+
+    def _close_smtp_connection(self):
+        """
+        Closes the open SMTP connection, if any.
+        """
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+        self._smtp_key = None
+
     def send_email_snapshot(self):
         """
         Sends an email with the logged events, detected faces, and optionally attached
@@ -110,7 +166,11 @@ class SendEmail:
 
             selected_frames = self.select_representative_frames(self.frame_buffer, 2)
 
-            for i, frame in enumerate(selected_frames):
+            for i, (frame, movement_box) in enumerate(selected_frames):
+                # Frames are shared with the camera, so annotate a private copy
+                frame = frame.copy()
+                if movement_box is not None:
+                    MovementDetection.annotate_image(frame, movement_box)
                 _, img_encoded = cv2.imencode('.jpg', frame)
                 image_data = img_encoded.tobytes()
                 image = MIMEImage(image_data, name=f"event_{i + 1}.jpg")
@@ -124,15 +184,24 @@ class SendEmail:
                     part.add_header('Content-Disposition', f'attachment; filename={os.path.basename(self.video_file_path)}')
                     msg.attach(part)
 
-            print("Connecting to SMTP server...")
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-            print("Logging into SMTP server...")
-            server.login(smtp_user, smtp_password)
             text = msg.as_string()
             print("Sending email...")
-            server.sendmail(from_email, to_email, text)
-            server.quit()
+            for attempt in range(2):
+                server = self._get_smtp_connection(smtp_server, smtp_port, smtp_user, smtp_password)
+                try:
+                    server.sendmail(from_email, to_email, text)
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    # The server may drop a kept-alive connection at any time; send
+                    # once more on a fresh connection before giving up
+                    self._close_smtp_connection()
+                    if attempt:
+                        raise
+                except (smtplib.SMTPException, OSError):
+                    # Do not reuse a connection that failed mid-send
+                    self._close_smtp_connection()
+                    raise
+            self._smtp_last_used = time.monotonic()
 
             self.alert_buffer = []
             self.frame_buffer = []
@@ -146,7 +215,7 @@ class SendEmail:
         Selects a specified number of representative frames from the buffer.
 
         Args:
-            frames (list): A list of frames to select from.
+            frames (list): A list of (frame, movement_box) pairs to select from.
             num_frames (int): The number of frames to select.
 
         Returns:
@@ -1,6 +1,10 @@
 import unittest
 from unittest.mock import patch
+import cv2
+import numpy as np
 from .video_camera import VideoCamera
+from .overlay_renderer import OverlayRenderer
+from .movement_detection import MovementDetection
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model  # Use this to get the User model
@@ -37,6 +41,47 @@ class TestVideoCameraInitialization(unittest.TestCase):
         mock_video_capture.assert_called_with(0)
 
 
+class TestOverlayRenderer(unittest.TestCase):
+
+    def test_put_text_matches_cv2(self):
+        # Sprite blitting should give the same pixels as drawing with cv2.putText,
+        # including text that runs off the frame
+        renderer = OverlayRenderer()
+        frame = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+        for text, org in [("Movement Detected", (30, 40)), ("Unknown", (300, 5)), ("Unknown", (-20, 230))]:
+            expected = frame.copy()
+            actual = frame.copy()
+            cv2.putText(expected, text, org, cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 0, 255), 1)
+            renderer.put_text(actual, text, org, cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 0, 255), 1)
+            np.testing.assert_array_equal(actual, expected)
+
+
+class TestMovementDetection(unittest.TestCase):
+
+    def test_hollow_outline_counts_enclosed_area(self):
+        # A thin outline changes fewer pixels than min_area, but its contour
+        # encloses more than that and must still count as movement
+        detector = MovementDetection(min_area=24000)
+        background = np.zeros((240, 320, 3), dtype=np.uint8)
+        detector.detect_movement(background)
+        frame = background.copy()
+        cv2.rectangle(frame, (60, 40), (260, 200), (255, 255, 255), 2)
+        movement_detected, movement_box = detector.detect_movement(frame)
+        self.assertTrue(movement_detected)
+        self.assertIsNotNone(movement_box)
+
+    def test_lasting_change_stops_reading_as_movement(self):
+        # A lighting change or an object that stays put is movement for one
+        # frame only; the frame after it is compared against the changed scene
+        detector = MovementDetection()
+        frame = np.full((240, 320, 3), 60, dtype=np.uint8)
+        detector.detect_movement(frame)
+        frame = frame + 80
+        cv2.rectangle(frame, (100, 80), (200, 180), (255, 255, 255), -1)
+        self.assertTrue(detector.detect_movement(frame)[0])
+        self.assertEqual(detector.detect_movement(frame.copy()), (False, None))
+
+
 class UserAuthTests(TestCase):
 
     def generate_password(self):
@@ -1,24 +1,40 @@
+import logging
 import threading
 import cv2
+import numpy as np
 import time
-from concurrent.futures import ThreadPoolExecutor
+import queue
+from collections import deque
 from datetime import datetime
 from .movement_detection import MovementDetection
 from .facial_recognition import FacialRecognition
 from .send_email import SendEmail
-import pytz
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    from backports.zoneinfo import ZoneInfo
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+except ImportError:  # PyTurboJPEG is optional; OpenCV encodes the stream otherwise
+    TurboJPEG = None
 import os
+import sys
 from django.conf import settings
 from .models import Event, AudioDeviceSetting
 import subprocess
+from functools import lru_cache
 from .object_classifier import ObjectClassifier
 from .dashboard_api_handler import DashboardAPIHandler
 from .audio_source import AudioSource
+from .overlay_renderer import OverlayRenderer
+
+logger = logging.getLogger(__name__)
 
 
 class VideoCamera:
     """
     A class to manage video streaming, frame processing, and event handling from a camera device, including audio capture using ALSA.
+    Frames are captured and checked for movement on a background thread; get_frame only renders the newest one.
 
     Attributes:
         camera_index (int): The index of the camera device to use.
@@ -33,21 +49,26 @@ class VideoCamera:
         send_email (SendEmail): Handles sending alert emails.
         dashboard_api (DashboardAPIHandler): Handles sending logs and video clips to a dashboard API.
         object_classifier (ObjectClassifier): Handles object classification in frames.
+        overlay_renderer (OverlayRenderer): Draws overlay text from cached sprites.
         classification_interval (int): The number of frames between object classifications.
         classification_counter (int): A counter to track frames for classification.
-        frame_skip_interval (int): The number of frames to skip between processing.
+        frame_skip_interval (int): The capture thread processes every Nth frame read from the camera.
         frame_count (int): A counter to track frames processed.
-        face_recognition_interval (int): The number of frames between face recognition.
-        face_recognition_counter (int): A counter to track frames for face recognition.
-        lock (threading.Lock): A lock to synchronize access to shared resources.
-        frames (list): A list to store frames for processing.
-        detected_faces (list): A list to store detected faces in frames.
-        executor (ThreadPoolExecutor): An executor to manage background tasks for frame processing.
-        email_executor (ThreadPoolExecutor): An executor to manage background tasks for email sending.
-        save_timer (threading.Timer): A timer to save running buffer clips periodically.
-        frame_buffer (list): A buffer to store frames for email snapshots.
-        running_buffer (list): A buffer to store frames for creating video clips.
-        last_alert_time (float): The timestamp of the last alert sent.
+        movement_detection_interval (int): Movement detection runs on every Nth processed frame; frames in between reuse the last result.
+        movement_result_ttl (float): The maximum age in seconds of a reused movement result.
+        face_recognition_interval (float): The minimum number of seconds between face recognition runs.
+        last_face_recognition_time (float): The monotonic clock reading when face recognition last ran.
+        full_face_detection_interval (float): The number of seconds after which face detection runs on the whole frame instead of only the Haar cascade's candidates.
+        face_recognition_workers (int): The number of face recognition worker threads; more than one only on free-threaded Python.
+        frames (queue.Queue): A bounded queue of (frame, downsampled frame or None) pairs awaiting face recognition; the oldest is dropped when full.
+        detected_faces (tuple): The faces detected in the most recently recognized frame, replaced as a whole on each update.
+        email_tasks (queue.Queue): A bounded queue of email sending tasks run in order by a background thread.
+        save_interval (int): The number of seconds between clip saves.
+        wait_for_clip_stabilization (bool): Whether to poll a finished clip's size until it stops changing before using it.
+        frame_buffer (deque): A bounded buffer of recent (frame, movement_box) pairs for email snapshots.
+        event_clips_dir (str): The directory where video clips are saved.
+        thumbnails_dir (str): The directory where clip thumbnails are saved.
+        last_alert_time (float): The monotonic clock reading when the last alert was sent.
         alert_interval (int): The minimum time interval between alerts.
     """
 
@@ -66,6 +87,7 @@ class VideoCamera:
         # Initialize the audio source, will fall back if no usable audio device
        # Initialize audio source and add event listener
         self.resolution = resolution  
+        self._latest = None  # Newest published frame; audio events may read it before capture starts
         self.audio_source = AudioSource()
         self.audio_source.add_listener(self.on_audio_event)  # Capture audio events
         self.audio_source.start()
@@ -74,197 +96,431 @@ class VideoCamera:
         self.camera_index = camera_index
         self.video = cv2.VideoCapture(camera_index)
         if not self.video.isOpened():
-            print(f"Error: Could not open video device at {camera_index}.")
+            logger.error("Could not open video device at %s.", camera_index)
             self.video = None
             self.initialized = False  # Camera failed to open
             return
 
         self.initialized = True  # Camera successfully opened
+        # Ask for MJPG before the frame size so UVC cameras send compressed frames,
+        # which libjpeg-turbo decodes faster than raw YUYV crosses USB 2.0
+        self.video.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
         self.video.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
         self.video.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+        # Drivers that cannot deliver MJPG silently keep their default format
+        fourcc = int(self.video.get(cv2.CAP_PROP_FOURCC))
+        fourcc_name = ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))
+        if fourcc_name != 'MJPG':
+            logger.warning("Camera %s did not accept MJPG, capturing as %r", camera_index, fourcc_name)
+        # Keep a single frame queued in the driver so reads return the newest frame,
+        # and ask for the 15 fps clips are encoded at so no frames are transferred
+        # and decoded only to be skipped. Backends that do not support these just
+        # ignore them.
+        self.video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.video.set(cv2.CAP_PROP_FPS, 15)
 
         self.movement_detection = MovementDetection()
-        self.facial_recognition = FacialRecognition()
+        self.facial_recognition = FacialRecognition.shared()  # Models are loaded once per process
         self.send_email = SendEmail(request)
 
         self.dashboard_api = DashboardAPIHandler(settings.DASHBOARD_API_URL)
 
         self.object_classifier = ObjectClassifier()  # Instantiate ObjectClassifier
+        self.overlay_renderer = OverlayRenderer()
         self.classification_interval = 5  # Classify every 5 frames
         self.classification_counter = 0
 
-        self.frame_skip_interval = 2
+        # Only skip frames when the camera ignored the 15 fps request.
+        reported_fps = float(self.video.get(cv2.CAP_PROP_FPS) or 0)
+        self.frame_skip_interval = max(1, round(reported_fps / 15)) if reported_fps > 0 else 1
         self.frame_count = 0
-        self.face_recognition_interval = 10
-        self.face_recognition_counter = 0
-
-        self.lock = threading.Lock()
-        self.frames = []
-        self.detected_faces = []
-
-        self.executor = ThreadPoolExecutor(max_workers=1)
-        self.executor.submit(self._process_frames)
+        # Run the detector on every Nth processed frame and reuse its result in between;
+        # a result older than movement_result_ttl seconds is never reused
+        self.movement_detection_interval = 2
+        self.movement_result_ttl = 0.2
+        self._movement_check_counter = 0
+        self._last_movement = (False, None)
+        self._last_movement_time = 0.0
+        self.face_recognition_interval = 1.0  # Recognize at most once a second while movement lasts
+        self.last_face_recognition_time = float('-inf')  # The first movement frame is recognized straight away
+        self.full_face_detection_interval = 5.0
+        self._last_full_face_detection = float('-inf')
+        # Recognition only ever looks at the newest frame, so the queue holds no backlog
+        self.frames = queue.Queue(maxsize=2)
+        self.detected_faces = ()
+
+        # Under the GIL extra recognition threads would only contend with capture;
+        # a free-threaded interpreter (3.13t, PYTHON_GIL=0) runs them on separate cores
+        gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+        self.face_recognition_workers = 1 if gil_enabled else min(4, os.cpu_count() or 1)
+        self._face_take_lock = threading.Lock()
+        # Workers can finish out of order, so each taken frame gets a sequence number
+        # and results older than the last published one are dropped
+        self._face_sequence = 0
+        self._published_face_sequence = 0
+        self._face_publish_lock = threading.Lock()
+        self._face_threads = [threading.Thread(target=self._process_frames, daemon=True)
+                              for _ in range(self.face_recognition_workers)]
+        for thread in self._face_threads:
+            thread.start()
+
+        # Emails are sent one at a time, in order, by a single background thread
+        self.email_tasks = queue.Queue(maxsize=8)
+        self._email_in_flight = threading.Event()  # Set while a movement snapshot email is queued or sending
+        self._email_thread = threading.Thread(target=self._email_loop, daemon=True)
+        self._email_thread.start()
+
+        self.save_interval = 60  # Seconds between clip saves
+        self.wait_for_clip_stabilization = False
+
+        self.frame_buffer = deque(maxlen=60)
+
+        # Clip frames are streamed into FFmpeg as they arrive by a writer thread, so a
+        # slow encoder never blocks capture; the open clip is (process, timestamp,
+        # filename, path) and is swapped out every save_interval
+        self._clip = None
+        self._clip_lock = threading.Lock()  # Held by the writer while writing and by the saver while detaching
+        self._clip_frames = queue.Queue(maxsize=64)
+
+        # Directories for saving clips and thumbnails, created once up front
+        self.event_clips_dir = os.path.join(settings.MEDIA_ROOT, 'event_clips')
+        self.thumbnails_dir = os.path.join(settings.MEDIA_ROOT, 'thumbnails')
+        os.makedirs(self.event_clips_dir, exist_ok=True)
+        os.makedirs(self.thumbnails_dir, exist_ok=True)
+        self.last_alert_time = time.monotonic()
+        self.alert_interval = 30  # 30 seconds
 
-        self.email_executor = ThreadPoolExecutor(max_workers=1)  # Executor for email sending
+        # Overlay timestamp: the timezone is resolved once and the text is
+        # only re-rendered when the wall-clock second changes
+        self._tz = ZoneInfo('US/Pacific')
+        self._ts_last_sec = None
+        self._ts_text = ''
+
+        # Capture and movement detection run on their own thread so they keep
+        # going with any number of streaming clients, including none
+        self._stop_event = threading.Event()
+        self._frame_cond = threading.Condition()
+        self._jpeg_cache = (None, None)  # (published frame tuple, its encoded JPEG)
+        self._overlay_buffers = threading.local()  # Per-thread scratch frame for drawing overlays
+        # Fixed stream encode settings: quality 80 instead of the default 95, and
+        # no Huffman table optimisation pass
+        self._jpeg_params = [int(cv2.IMWRITE_JPEG_QUALITY), 80, int(cv2.IMWRITE_JPEG_OPTIMIZE), 0]
+        self._turbojpeg = None
+        if TurboJPEG is not None:
+            try:
+                # Encodes straight into bytes, skipping OpenCV's intermediate buffer
+                self._turbojpeg = TurboJPEG()
+            except (OSError, RuntimeError) as e:
+                logger.warning("libturbojpeg could not be loaded, encoding with OpenCV: %s", e)
+        self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._capture_thread.start()
 
-        self.save_timer = threading.Timer(60, self.save_running_buffer_clip)
-        self.save_timer.start()
+        self._clip_writer_thread = threading.Thread(target=self._clip_writer_loop, daemon=True)
+        self._clip_writer_thread.start()
 
-        self.frame_buffer = []
-        self.running_buffer = []
-        self.last_alert_time = time.time()
-        self.alert_interval = 30  # 30 seconds
+        # One long-lived thread finishes a clip every save_interval seconds
+        self._save_thread = threading.Thread(target=self._save_loop, daemon=True)
+        self._save_thread.start()
 
     def on_audio_event(self, volume):
-        """Triggered when audio event occurs. Capture frame and store it."""
-        print(f"Audio event detected with volume: {volume}. Capturing frame...")
-        success, frame = self.video.read()
-        timestamp = time.time()  # Capture the exact time when the frame is captured
-        if success:
-            self.frames.append((frame, timestamp))
-            self.running_buffer.append((frame, timestamp))  # Store frame and timestamp
+        """Triggered when audio event occurs. Store the newest captured frame."""
+        logger.debug("Audio event detected with volume: %s. Capturing frame...", volume)
+        # Reuse the capture thread's frame rather than reading the device from this thread
+        latest = self._latest
+        if latest is not None:
+            frame = latest[0]
+            put_latest(self.frames, (frame, None))
+            put_latest(self._clip_frames, frame)
 
     
     def __del__(self):
         """Handles cleanup by releasing resources when the object is destroyed."""
+        if hasattr(self, '_stop_event'):
+            self._stop_event.set()
+        if hasattr(self, 'frames'):
+            put_latest(self.frames, None)  # Wakes _process_frames so it can exit
+        if hasattr(self, '_clip_frames'):
+            put_latest(self._clip_frames, None)  # Wakes the clip writer so it can exit
         if self.video:
             self.video.release()
-        if hasattr(self, 'save_timer'):
-            self.save_timer.cancel()
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=False)
-        if hasattr(self, 'email_executor'):
-            self.email_executor.shutdown(wait=False)
+        if hasattr(self, 'email_tasks'):
+            put_latest(self.email_tasks, None)  # Wakes the email thread so it can exit
         if hasattr(self, 'pulse_manager') and self.pulse_manager:
             self.pulse_manager.close()
             
-    def get_frame(self):
+    def _capture_loop(self):
+        """
+        Background task that reads frames from the camera, runs movement detection,
+        object classification and alerting on them, and publishes the newest frame
+        for get_frame.
+        """
+        while not self._stop_event.is_set():
+            # Skipped frames are only grabbed, which drains them from the driver
+            # without paying for decoding and colour conversion
+            self.frame_count += 1
+            if self.frame_count % self.frame_skip_interval != 0:
+                if not self.video.grab():
+                    time.sleep(0.1)
+                continue
+
+            success, image = self.video.read()
+            if not success:
+                time.sleep(0.1)
+                continue
+
+            # Most drivers honour the requested size, so only resize when they did not
+            width, height = self.resolution
+            if image.shape[1] != width or image.shape[0] != height:
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+            self._movement_check_counter += 1
+            now = time.monotonic()
+            small_image = None
+            if (self._movement_check_counter >= self.movement_detection_interval
+                    or now - self._last_movement_time > self.movement_result_ttl):
+                # Downsample once for both movement detection and the face detector
+                small_image = cv2.resize(image, self.movement_detection.detection_size, interpolation=cv2.INTER_AREA)
+                movement_detected, movement_box = self.movement_detection.detect_movement(image, small_image)
+                self._last_movement = (movement_detected, movement_box)
+                self._last_movement_time = now
+                self._movement_check_counter = 0
+            else:
+                movement_detected, movement_box = self._last_movement
+            object_label = None
+            if movement_detected:
+                # The clean frame is shared by reference with face recognition and the email
+                # buffer, and written to the clip; overlays are only drawn on the streamed copy.
+                # Marking it read-only makes any accidental in-place drawing fail loudly.
+                image.setflags(write=False)
+                put_latest(self.frames, (image, small_image))
+                self.frame_buffer.append((image, movement_box))
+                put_latest(self._clip_frames, image)
+
+                # Only classify objects if movement is detected
+                self.dashboard_api.send_log_async("movement", "Movement detected", extra_data={"movement_box": movement_box})
+                self.classification_counter += 1
+                if self.classification_counter >= self.classification_interval:
+                    object_label = self.object_classifier.classify_object(image)  # Use ObjectClassifier
+                    self.classification_counter = 0
+                    logger.debug("%s seen in the frame", object_label)
+
+                    # Log the object classification event
+                    self.dashboard_api.send_log_async("classification", f"{object_label} seen in the frame")
+
+                    self.send_email.log_event(f"{object_label} seen in the frame")
+
+                # Attempt to send email snapshot
+                if time.monotonic() - self.last_alert_time >= self.alert_interval:
+                    self.send_email.log_event("Movement detected")
+                    # Only one snapshot is queued at a time; alerts raised while it is
+                    # pending are coalesced into it through the shared alert buffer
+                    if not self._email_in_flight.is_set():
+                        self._email_in_flight.set()
+                        self.send_email.frame_buffer = list(self.frame_buffer)  # References only, no pixel copies
+                        if self._submit_email(self._send_and_clear):  # Send email asynchronously
+                            logger.debug("Email queued from VC class")
+                        else:
+                            self._email_in_flight.clear()
+                    self.last_alert_time = time.monotonic()
+
+            # Publishing is a single reference swap, which is atomic in CPython; the
+            # condition lock is only taken to wake waiting clients
+            self._latest = (image, movement_box, object_label)
+            with self._frame_cond:
+                self._frame_cond.notify_all()
+
+    def _submit_email(self, task):
         """
-        Captures a frame from the video feed, processes it for movement detection,
-        face recognition, and object classification, and returns the processed frame.
+        Queues an email sending task for the email thread.
+
+        Args:
+            task (callable): The task to run.
 
         Returns:
-            bytes: The processed frame as a JPEG-encoded image, or None if capturing failed.
+            bool: True if the task was queued, False if it was dropped because the queue is full.
         """
-        if not self.video:
-            return None
-        success, image = self.video.read()
-        if not success:
-            return None
+        try:
+            self.email_tasks.put_nowait(task)
+            return True
+        except queue.Full:
+            logger.warning("Email queue is full, dropping email")
+            return False
 
-        self.frame_count += 1
-        if self.frame_count % self.frame_skip_interval != 0:
-            return None
+    def _email_loop(self):
+        """
+        Background task that runs queued email tasks in order. Returns when it
+        receives None from the queue.
+        """
+        while True:
+            task = self.email_tasks.get()
+            if task is None:
+                return
+            try:
+                task()
+            except Exception as e:
+                logger.exception("Error sending email: %s", e)
+
+    def _send_and_clear(self):
+        """
+        Sends the pending movement snapshot email and then allows the next one to be queued.
+        """
+        try:
+            self.send_email.send_email_snapshot()
+        finally:
+            self._email_in_flight.clear()
 
-        image = cv2.resize(image, (320, 240))
-
-        movement_detected, movement_box = self.movement_detection.detect_movement(image)
-        if movement_detected:
-            with self.lock:
-                self.frames.append(image.copy())
-            x, y, width, height = movement_box
-            cv2.rectangle(image, (x, y), (x + width, y + height), (0, 0, 255), 1)
-            cv2.putText(image, "Movement Detected", (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 0, 255), 1)
-            self.frame_buffer.append(image.copy())  # Ensure frame is added here
-            self.running_buffer.append(image.copy())
-
-            # Only classify objects if movement is detected
-            self.dashboard_api.send_log("movement", "Movement detected", extra_data={"movement_box": movement_box})
-            self.classification_counter += 1
-            if self.classification_counter >= self.classification_interval:
-                object_label = self.object_classifier.classify_object(image)  # Use ObjectClassifier
-                self.classification_counter = 0
-                cv2.putText(image, object_label, (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-                print(f"{object_label} seen in the frame")
-
-                # Log the object classification event
-                self.dashboard_api.send_log("classification", f"{object_label} seen in the frame")
-
-                self.send_email.log_event(f"{object_label} seen in the frame")
-
-            # Attempt to send email snapshot
-            if time.time() - self.last_alert_time >= self.alert_interval:
-                self.send_email.log_event("Movement detected")
-                self.send_email.frame_buffer = self.frame_buffer.copy()
-                self.email_executor.submit(self.send_email.send_email_snapshot)  # Send email asynchronously
-                print("Email sent from VC class")
-                self.last_alert_time = time.time()
-
-        detected_faces = []
-        with self.lock:
-            for face in self.detected_faces:
-                detected_faces.append(face)
-
-        for face in detected_faces:
+    def get_frame(self, timeout=1.0):
+        """
+        Waits for the capture thread to publish its next frame, draws the movement,
+        classification, face and timestamp overlays onto a copy of it, and returns
+        the result. Each published frame is encoded once and shared by all clients.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait for a new frame.
+
+        Returns:
+            bytes: The processed frame as a JPEG-encoded image, or None if no new frame arrived in time.
+        """
+        if not self.video:
+            return None
+        with self._frame_cond:
+            if not self._frame_cond.wait(timeout):
+                return None
+        latest = self._latest
+
+        # Every streaming client waits for the same published frame, so the first
+        # one to get here encodes it and the others reuse the JPEG
+        cached_frame, cached_jpeg = self._jpeg_cache
+        if cached_frame is latest:
+            return cached_jpeg
+        image, movement_box, object_label = latest
+
+        # The published frame is shared with the background consumers, so draw on a copy.
+        # Each streaming thread keeps its own overlay buffer and copies into it; the
+        # buffer is free again once the JPEG below has been encoded.
+        overlay = getattr(self._overlay_buffers, 'buffer', None)
+        if overlay is None or overlay.shape != image.shape:
+            overlay = self._overlay_buffers.buffer = np.empty_like(image)
+        np.copyto(overlay, image)
+        put_text = self.overlay_renderer.put_text
+        if movement_box is not None:
+            MovementDetection.annotate_image(overlay, movement_box, put_text)
+        if object_label is not None:
+            put_text(overlay, object_label, (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+
+        # detected_faces is an immutable tuple that is only ever replaced, so the
+        # reference can be read without locking
+        for face in self.detected_faces:
             x, y, width, height = face['box']
-            cv2.rectangle(image, (x, y), (x + width, y + height), (0, 255, 0), 1)
+            cv2.rectangle(overlay, (x, y), (x + width, y + height), (0, 255, 0), 1)
             label = face.get('label', 'Unknown')
-            cv2.putText(image, label, (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 255, 0), 1)
+            put_text(overlay, label, (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 255, 0), 1)
 
-        try:
-            local_time = datetime.now(pytz.timezone('US/Pacific'))
-            timestamp_text = local_time.strftime('%Y-%m-%d %H:%M:%S %Z')
-            cv2.putText(image, timestamp_text, (10, image.shape[0] - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        except Exception as e:
-            print(f"Error adding timestamp: {e}")
+        # The timestamp changes every second, so a cached sprite would rarely be reused
+        cv2.putText(overlay, self._timestamp_text(), (10, overlay.shape[0] - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
-        ret, jpeg = cv2.imencode('.jpg', image)
-        return jpeg.tobytes()
+        if self._turbojpeg is not None:
+            jpeg = self._turbojpeg.encode(overlay, quality=80, pixel_format=TJPF_BGR)
+        else:
+            ret, jpeg = cv2.imencode('.jpg', overlay, self._jpeg_params)
+            jpeg = jpeg.tobytes()
+        self._jpeg_cache = (latest, jpeg)
+        return jpeg
+
+    def _timestamp_text(self):
+        """
+        Returns the overlay timestamp for the current second, formatting it only
+        when the second has changed since the last call.
+
+        Returns:
+            str: The local time formatted as 'YYYY-MM-DD HH:MM:SS TZ'.
+        """
+        sec = int(time.time())
+        if sec != self._ts_last_sec:
+            self._ts_text = datetime.fromtimestamp(sec, self._tz).strftime('%Y-%m-%d %H:%M:%S %Z')
+            self._ts_last_sec = sec
+        return self._ts_text
 
     def _process_frames(self):
         """
         Background task that processes frames for face recognition and updates
-        the list of detected faces.
+        the list of detected faces, at most once every face_recognition_interval
+        seconds. Returns when the camera is stopped or it receives None from the
+        queue, passing the None on so any other workers stop too.
         """
         while True:
-            if not self.frames:
-                time.sleep(0.01)
-                continue
-
-            with self.lock:
-                frame = self.frames.pop(0)
-
-            self.face_recognition_counter += 1
-            if self.face_recognition_counter >= self.face_recognition_interval:
-                recognized_faces = self.facial_recognition.recognize_faces(frame)
-                with self.lock:
-                    self.detected_faces = recognized_faces
+            # One worker at a time waits for recognition to come due and then takes a
+            # frame. Frames stay queued while it waits, so the newest one is recognized.
+            with self._face_take_lock:
+                wait = self.last_face_recognition_time + self.face_recognition_interval - time.monotonic()
+                if wait > 0 and self._stop_event.wait(wait):
+                    return
+                frame = self.frames.get()  # Blocks until the producer hands over a frame
+                if frame is None:
+                    put_latest(self.frames, None)
+                    return
+                # Drain the queue and keep only the newest frame, so recognition
+                # works on what the camera sees now rather than on a backlog
+                while True:
+                    try:
+                        item = self.frames.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        put_latest(self.frames, None)
+                        return
+                    frame = item
+                self.last_face_recognition_time = time.monotonic()
+                self._face_sequence += 1
+                sequence = self._face_sequence
+                # Periodically skip the cascade so MTCNN also finds faces it misses
+                full_detection = (self.last_face_recognition_time - self._last_full_face_detection
+                                  >= self.full_face_detection_interval)
+                if full_detection:
+                    self._last_full_face_detection = self.last_face_recognition_time
+
+            # Recognition runs outside the lock, so when it takes longer than the
+            # interval another worker starts on the next frame in parallel
+            image, small_image = frame
+            recognized_faces = self.facial_recognition.recognize_faces_batch(
+                [image], small_frames=[small_image], prefilter=not full_detection)[0]
+            with self._face_publish_lock:
+                if sequence < self._published_face_sequence:
+                    continue  # A newer frame's result is already published
+                self._published_face_sequence = sequence
+                self.detected_faces = tuple(recognized_faces)  # Atomic reference swap
                 self.send_email.set_detected_faces(recognized_faces)  # Pass detected faces to SendEmail
-                self.face_recognition_counter = 0
 
-                # Send face recognition log with face names
-                for face in recognized_faces:
-                    face_name = face.get('label', 'Unknown')
-                    self.dashboard_api.send_log("face_recognition", f"Detected face: {face_name}", extra_data={"face_name": face_name})
+            # Send face recognition log with face names
+            for face in recognized_faces:
+                face_name = face.get('label', 'Unknown')
+                self.dashboard_api.send_log_async("face_recognition", f"Detected face: {face_name}", extra_data={"face_name": face_name})
 
-    def save_running_buffer_clip(self):
+    def _start_clip(self):
         """
-        Saves the frames in the running buffer as a video clip, captures audio, generates a thumbnail,
-        and sends the clip and thumbnail to the dashboard API and via email.
-        """
-        # Directories for saving clips and thumbnails
-        event_clips_dir = os.path.join(settings.MEDIA_ROOT, 'event_clips')
-        thumbnails_dir = os.path.join(settings.MEDIA_ROOT, 'thumbnails')
-
-        if not os.path.exists(event_clips_dir):
-            os.makedirs(event_clips_dir)
-        if not os.path.exists(thumbnails_dir):
-            os.makedirs(thumbnails_dir)
+        Starts the FFmpeg process for a new clip, which encodes frames as they are
+        written to its stdin.
 
+        Returns:
+            tuple: The FFmpeg process, the clip timestamp, the video filename and the video file path.
+        """
         # Timestamp for file naming
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         video_filename = f"event_{timestamp}.mp4"
-        video_file_path = os.path.join(event_clips_dir, video_filename)
+        video_file_path = os.path.join(self.event_clips_dir, video_filename)
 
-        # Frame rate and duration
+        # Frame rate
         fps = 15  # Frames per second
-        duration_seconds = len(self.running_buffer) / fps  # Calculate duration from the number of frames in the buffer
 
-        # FFmpeg command to handle both video and audio creation with sync options
+        # FFmpeg command to handle both video and audio creation with sync options.
+        # The process stays open for the whole clip, so stderr is kept to errors only
+        # to stop its pipe from filling up and stalling the encoder.
         command = [
             'ffmpeg',
             '-y',  # Overwrite output files without asking
+            '-loglevel', 'error',
+            '-nostats',
             '-f', 'rawvideo',
             '-pix_fmt', 'bgr24',
             '-s', f'{self.resolution[0]}x{self.resolution[1]}',  # Video resolution
@@ -272,6 +528,10 @@ class VideoCamera:
             '-i', '-',  # Input comes from a pipe (for video frames)
         ]
 
+        # Hardware encoders that take frames from GPU memory need an upload step at
+        # the end of the filter chain, and pick their own pixel format
+        encoder_args, upload_filter = video_encoder_args()
+
         # Capture audio from the AudioSource
         audio_device = self.audio_source.get_device_name()
         if audio_device and audio_device != 'default':
@@ -279,55 +539,95 @@ class VideoCamera:
                 '-itsoffset', '10',  # adjust the offset here if needed for synchronization
                 '-f', 'alsa',  # Use ALSA for audio input
                 '-i', f'{audio_device}',  # ALSA device for audio input
-                '-c:v', 'libx264',  # Video codec
-                '-preset', 'fast',  # Video encoding speed
+                *encoder_args,  # Video codec, encoding speed and pixel format
                 '-c:a', 'aac',  # Audio codec
                 '-ar', '48000',  # Audio sample rate
                 '-b:a', '128k',  # Audio bitrate
-                '-pix_fmt', 'yuv420p',  # Pixel format for video
                 '-async', '1',  # Sync the audio stream with the video
                 '-vsync', '1',  # Keep video in sync with the audio
+                '-shortest',  # Stop recording audio when the video input is closed
             ])
         else:
             # If no audio is available, proceed without adding audio settings
             command.extend([
-                '-c:v', 'libx264',  # Video codec
-                '-preset', 'fast',  # Video encoding speed
-                '-pix_fmt', 'yuv420p',  # Pixel format for video
+                *encoder_args,  # Video codec, encoding speed and pixel format
                 '-vsync', '1',  # Keep video in sync
             ])
         command.extend([
-            '-vf', 'setpts=PTS*1.5',  # Slow down the playback by 2x
+            '-vf', 'setpts=PTS*1.5' + (f',{upload_filter}' if upload_filter else ''),  # Slow down the playback by 2x
         ])
 
 
         command.extend([
-            '-t', str(duration_seconds),  # Specify the duration of the video
             '-f', 'mp4',  # Specify MP4 as the output format
             video_file_path  # Output video file path
         ])
 
 
         # Start FFmpeg process
-        process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   **FFMPEG_SPAWN_ARGS)
+        return process, timestamp, video_filename, video_file_path
 
-        try:
-            # Write all frames from the running buffer to FFmpeg
-            for frame in self.running_buffer:
-                process.stdin.write(frame.tobytes())
+    def _write_clip_frame(self, frame):
+        """
+        Writes a frame to the current clip, starting a new clip if none is open.
+
+        Args:
+            frame (ndarray): The frame to add to the clip.
+        """
+        with self._clip_lock:
+            if self._clip is None:
+                self._clip = self._start_clip()
+            try:
+                # Hand FFmpeg the frame's own memory rather than a bytes copy of it
+                self._clip[0].stdin.write(memoryview(np.ascontiguousarray(frame)).cast('B'))
+            except Exception as e:
+                logger.error("Error writing frame to FFmpeg process: %s", e)
+
+    def _clip_writer_loop(self):
+        """
+        Background task that writes queued frames to the current clip. Returns when
+        it receives None from the queue.
+        """
+        while True:
+            frame = self._clip_frames.get()
+            if frame is None:
+                return
+            self._write_clip_frame(frame)
+
+    def _save_loop(self):
+        """
+        Background task that saves the current clip every save_interval seconds,
+        until the camera is stopped.
+        """
+        while not self._stop_event.wait(self.save_interval):
+            try:
+                self.save_running_buffer_clip()
+            except Exception as e:
+                logger.exception("Error saving clip: %s", e)
 
-        except Exception as e:
-            print(f"Error writing frame to FFmpeg process: {e}")
+    def save_running_buffer_clip(self):
+        """
+        Finishes the clip written since the last save, generates a thumbnail,
+        and sends the clip and thumbnail to the dashboard API and via email.
+        """
+        # Detach the open clip so frames arriving from now on start the next one
+        with self._clip_lock:
+            clip, self._clip = self._clip, None
+        if clip is None:
+            # No frames were written during this period
+            return
+        process, timestamp, video_filename, video_file_path = clip
 
-        process.stdin.close()
-        process.wait()
+        # Closing stdin ends the video input; FFmpeg then finalizes the file
+        _, error_output = process.communicate()
 
         if process.returncode != 0:
-            error_output = process.stderr.read().decode()
-            print(f"FFmpeg error: {error_output}")
+            logger.error("FFmpeg error: %s", error_output.decode())
         else:
             # Ensure the file is fully written and closed before sending
-            print(f"Video file {video_file_path} written successfully")
+            logger.info("Video file %s written successfully", video_file_path)
 
             # Change permissions and/or ownership after the file is created
             try:
@@ -335,18 +635,20 @@ class VideoCamera:
                 os.chmod(video_file_path, 0o666)  # rw-rw-rw-
                 # Optionally, change file ownership (replace 'your-username' with the actual user)
                 # os.chown(video_file_path, uid, gid)
-                print(f"Permissions changed for {video_file_path}")
+                logger.debug("Permissions changed for %s", video_file_path)
             except Exception as e:
-                print(f"Error changing permissions for {video_file_path}: {e}")
+                logger.error("Error changing permissions for %s: %s", video_file_path, e)
 
-            # Check for file size stabilization
-            wait_for_file_stabilization(video_file_path)
+            # FFmpeg has exited, so the file is already closed and complete; polling its
+            # size is only needed where writes can land late, such as network mounts
+            if self.wait_for_clip_stabilization:
+                wait_for_file_stabilization(video_file_path)
             # Attempt to generate a thumbnail
             try:
                 thumbnail_filename = f"thumb_{timestamp}.jpg"
-                thumbnail_path = os.path.join(thumbnails_dir, thumbnail_filename)
+                thumbnail_path = os.path.join(self.thumbnails_dir, thumbnail_filename)
                 self.generate_thumbnail(video_file_path, thumbnail_path)
-                print(f"Thumbnail generated: {thumbnail_path}")
+                logger.info("Thumbnail generated: %s", thumbnail_path)
 
                 # Save event in the database with thumbnail
                 event = Event(event_type='Periodic', description='Periodic buffer save',
@@ -355,21 +657,14 @@ class VideoCamera:
 
                 # Pass the video file path to the SendEmail instance
                 self.send_email.set_video_file_path(video_file_path)
-                self.email_executor.submit(self.send_email.send_email_snapshot)
+                self._submit_email(self.send_email.send_email_snapshot)
                 self.dashboard_api.send_video(video_file_path, description="Periodic buffer save",
                                             thumbnail_path=f'thumbnails/{thumbnail_filename}')
 
             except subprocess.CalledProcessError as e:
-                print(f"Failed to generate thumbnail: {e.stderr.decode()}")
+                logger.error("Failed to generate thumbnail: %s", e.stderr.decode())
             except Exception as e:
-                print(f"Unexpected error during thumbnail generation: {str(e)}")
-
-        # Clear the buffer after saving the clip
-        self.running_buffer = []
-
-        # Restart the timer to repeat the process
-        self.save_timer = threading.Timer(60, self.save_running_buffer_clip)
-        self.save_timer.start()
+                logger.exception("Unexpected error during thumbnail generation: %s", e)
 
 
     def generate_thumbnail(self, video_path, thumbnail_path, time="00:00:05"):
@@ -390,12 +685,72 @@ class VideoCamera:
             thumbnail_path  # Output thumbnail file path
         ]
         try:
-            result = subprocess.run(command, check=True, stderr=subprocess.PIPE)
+            result = subprocess.run(command, check=True, stderr=subprocess.PIPE, **FFMPEG_SPAWN_ARGS)
         except subprocess.CalledProcessError as e:
-            # Capture and print detailed error information
-            print(f"FFmpeg command failed with error: {e.stderr.decode()}")
+            # Log detailed error information
+            logger.error("FFmpeg command failed with error: %s", e.stderr.decode())
             raise
 
+# FFmpeg children inherit none of the server's descriptors (sockets, pipes of other
+# clips) and run in their own session, so terminal signals meant for the server do
+# not cut a clip short
+FFMPEG_SPAWN_ARGS = {'close_fds': True, 'start_new_session': True}
+
+# Candidate encoders in order of preference, as (ffmpeg arguments, filter appended
+# to the video filter chain). The last one is the software fallback.
+VIDEO_ENCODERS = [
+    (['-c:v', 'h264_nvenc', '-preset', 'p1', '-tune', 'ull', '-rc', 'vbr', '-b:v', '1M', '-pix_fmt', 'yuv420p'], ''),
+    (['-vaapi_device', '/dev/dri/renderD128', '-c:v', 'h264_vaapi', '-qp', '24'], 'format=nv12,hwupload'),
+    (['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency', '-pix_fmt', 'yuv420p'], ''),
+]
+
+@lru_cache(maxsize=None)
+def video_encoder_args():
+    """
+    Picks the ffmpeg video encoder for clip saves. Each candidate is tried once
+    with a tiny test encode, since ffmpeg can list NVENC or VAAPI even when no
+    usable GPU is present. The result is cached for the life of the process.
+
+    Returns:
+        tuple: The ffmpeg arguments selecting the encoder and its options, and the
+               filter to append to the video filter chain ('' if none is needed).
+    """
+    for encoder_args, upload_filter in VIDEO_ENCODERS[:-1]:
+        probe = ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+                 '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+                 *encoder_args]
+        if upload_filter:
+            probe.extend(['-vf', upload_filter])
+        probe.extend(['-f', 'null', '-'])
+        try:
+            subprocess.run(probe, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10,
+                           **FFMPEG_SPAWN_ARGS)
+            logger.info("Using video encoder: %s", encoder_args[encoder_args.index('-c:v') + 1])
+            return tuple(encoder_args), upload_filter
+        except (OSError, subprocess.SubprocessError):
+            continue
+    encoder_args, upload_filter = VIDEO_ENCODERS[-1]
+    return tuple(encoder_args), upload_filter
+
+def put_latest(q, item):
+    """
+    Puts an item on a bounded queue without blocking, discarding the oldest
+    queued item when the queue is full so the newest data always gets through.
+
+    Args:
+        q (queue.Queue): The bounded queue to put the item on.
+        item: The item to enqueue.
+    """
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
 # Check for file size stabilization
 def wait_for_file_stabilization(file_path, timeout=10, interval=0.5):
     start_time = time.time()
@@ -1,4 +1,5 @@
 import threading
+from collections import deque
 from django.http import StreamingHttpResponse, JsonResponse, HttpResponse
 from django.shortcuts import render, redirect
 from django.conf import settings
@@ -9,9 +10,8 @@ from .models import Face, Event
 from .forms import TagFaceForm, CustomUserCreationForm, UploadFaceForm
 import cv2
 import numpy as np
-from mtcnn.mtcnn import MTCNN
-from scipy.spatial.distance import euclidean
 import os
+import glob
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -22,6 +22,7 @@ from .utils import reconcile_faces
 import pytz
 import logging
 from .video_camera import VideoCamera
+from .facial_recognition import get_mtcnn
 from .forms import EmailSettingsForm, UserSettingsForm
 from .models import EmailSettings
 from urllib.parse import unquote
@@ -36,6 +37,7 @@ from .models import AudioDeviceSetting
 import sys
 
 camera_instances = []
+camera_instances_lock = threading.Lock()  # Serializes lookup and creation so a device is only opened once
 
 # Check if the script is running a management command
 is_management_command = len(sys.argv) > 1 and sys.argv[1] in ['makemigrations', 'migrate', 'createsuperuser', 'collectstatic']
@@ -46,17 +48,27 @@ if not is_management_command:
     from tensorflow.keras.applications.resnet50 import preprocess_input, ResNet50
     from tensorflow.keras.models import Model
 
-os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+    # Use a GPU when one is present, growing TensorFlow's allocation as needed so
+    # ONNX Runtime and the video encoder can share the device
+    for gpu in tf.config.list_physical_devices('GPU'):
+        try:
+            tf.config.experimental.set_memory_growth(gpu, True)
+        except RuntimeError:
+            pass  # The GPU was already initialized
 
-log_lock = threading.Lock()
-logs = []
+# The newest log entries; appends are atomic and drop the oldest entry once full
+logs = deque(maxlen=100)
 
 # Global variable to hold the camera instance
 camera_instance = None
 
+# How long the list of /dev/video* devices is reused before /dev is scanned again
+CAMERA_LIST_CACHE_SECONDS = 60
+
 def list_cameras(max_cameras=4):
     """
     Lists available camera devices, prioritizing /dev/video0, and limits the list to a maximum of 4 devices.
+    The list is cached for CAMERA_LIST_CACHE_SECONDS, so requests do not rescan /dev each time.
     
     Args:
         max_cameras (int): The maximum number of camera devices to return.
@@ -64,42 +76,40 @@ def list_cameras(max_cameras=4):
     Returns:
         list: A list of paths to the available camera devices, limited to max_cameras.
     """
+    return cache.get_or_set(f'camera_devices_{max_cameras}', lambda: _scan_cameras(max_cameras),
+                            CAMERA_LIST_CACHE_SECONDS)
+
+def _scan_cameras(max_cameras):
+    """
+    Scans /dev for video devices.
+
+    Args:
+        max_cameras (int): The maximum number of camera devices to return.
+
+    Returns:
+        list: The sorted device paths, so /dev/video0 comes first, limited to max_cameras.
+    """
     camera_devices = []
     
     try:
-        # Check if /dev/video0 exists and add it first
-        if os.path.exists('/dev/video0'):
-            camera_devices.append('/dev/video0')
-        
-        # List other video devices, excluding /dev/video0
-        for filename in os.listdir('/dev'):
-            if filename.startswith('video') and f'/dev/{filename}' != '/dev/video0':
-                device_path = os.path.join('/dev', filename)
-                camera_devices.append(device_path)
-        
-        # Limit the number of cameras to max_cameras
-        camera_devices = camera_devices[:max_cameras]
-        
+        camera_devices = sorted(glob.glob('/dev/video*'))[:max_cameras]
     except Exception as e:
         print(f"Error listing cameras: {e}")
     
     print("Camera devices:", camera_devices)
     return camera_devices
 
-list_cameras()
-
-def log_event(event):
+def add_log(event):
     """
-    Logs an event with a timestamp.
+    Logs an event with a timestamp. Named apart from the log_event API view,
+    which would otherwise replace this function at import.
 
     Args:
         event (str): Description of the event.
     """
-    global logs
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     log_entry = f"[{timestamp}] {event}"
-    with log_lock:
-        logs.append(log_entry)
+    logs.append(log_entry)
     print("log event call", log_entry)  # Debug statement
 
 def get_logs(request):
@@ -112,9 +122,7 @@ def get_logs(request):
     Returns:
         JsonResponse: A JSON response containing the last 100 log entries.
     """
-    global logs
-    with log_lock:
-        log_data = logs[-100:]  # Get the last 100 log entries
+    log_data = list(logs)  # The deque only holds the last 100 log entries
     print("Fetching logs:", log_data)  # Debug statement
     return JsonResponse({'logs': log_data})
 
@@ -132,21 +140,22 @@ def initialize_camera(request, device_path):
     global camera_instances
     normalized_device_path = f"/dev/{device_path.split('/')[-1]}"
 
-    # Check if the camera is already initialized
-    for camera in camera_instances:
-        if camera.camera_index == normalized_device_path:
-            print(f"Camera at {normalized_device_path} is already initialized.")
-            return camera
+    with camera_instances_lock:
+        # Check if the camera is already initialized
+        for camera in camera_instances:
+            if camera.camera_index == normalized_device_path:
+                print(f"Camera at {normalized_device_path} is already initialized.")
+                return camera
 
-    # Create new camera instance if not found in initialized list
-    camera = VideoCamera(camera_index=normalized_device_path, request=request)
-    if camera.video is None or not camera.video.isOpened():
-        print(f"Failed to open camera at {normalized_device_path}.")
-        return None
+        # Create new camera instance if not found in initialized list
+        camera = VideoCamera(camera_index=normalized_device_path, request=request)
+        if camera.video is None or not camera.video.isOpened():
+            print(f"Failed to open camera at {normalized_device_path}.")
+            return None
 
-    camera_instances.append(camera)
-    print(f"Camera at {normalized_device_path} initialized successfully.")
-    return camera
+        camera_instances.append(camera)
+        print(f"Camera at {normalized_device_path} initialized successfully.")
+        return camera
 
 def initialize_all_cameras(request):
     """
@@ -187,26 +196,11 @@ def video_feed(request, device_path):
     Returns:
         StreamingHttpResponse: The video stream from the camera.
     """
-    global camera_instances
-
-    # Normalize device path (remove leading/trailing slashes)
-    normalized_device_path = f"/dev/{device_path.split('/')[-1]}"
-
-    # Check if camera instance for this device path already exists
-    for camera in camera_instances:
-        if camera.camera_index == normalized_device_path:  # Use camera_index instead of device_path
-            print(f"Reusing existing camera instance for {normalized_device_path}")
-            return StreamingHttpResponse(gen(camera),
-                                         content_type='multipart/x-mixed-replace; boundary=frame')
-
-    # If not found, create and cache a new camera instance
-    print(f"Creating new camera instance for {normalized_device_path}")
-    camera = VideoCamera(camera_index=normalized_device_path, request=request)
-    if camera.video is None or not camera.video.isOpened():
+    # Reuse the camera for this device if there is one, creating it otherwise
+    camera = initialize_camera(request, device_path)
+    if camera is None:
         return HttpResponse("Camera not found", status=404)
 
-    camera_instances.append(camera)
-
     return StreamingHttpResponse(gen(camera),
                                  content_type='multipart/x-mixed-replace; boundary=frame')
 
@@ -345,14 +339,20 @@ def upload_face(request):
             face = form.save(commit=False)
             # Process the uploaded image
             image_file = request.FILES['image']
-            image_array = np.frombuffer(image_file.read(), np.uint8)
-            image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+            # Copy the upload chunk by chunk into one buffer instead of reading it
+            # into a bytes object first
+            image_array = np.empty(image_file.size, np.uint8)
+            position = 0
+            for chunk in image_file.chunks():
+                image_array[position:position + len(chunk)] = np.frombuffer(chunk, np.uint8)
+                position += len(chunk)
+            image = cv2.imdecode(image_array[:position], cv2.IMREAD_COLOR)
 
             if image is None:
                 form.add_error('image', 'Image not valid. Please upload a valid image file.')
             else:
                 # Detect and crop the face
-                detector = MTCNN()
+                detector = get_mtcnn()
                 faces = detector.detect_faces(image)
                 if faces:
                     x, y, width, height = faces[0]['box']
@@ -123,6 +123,52 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 KNOWN_FACES_DIR = os.path.join(MEDIA_ROOT, 'known_faces')
 
+# Screen frames with OpenCV's Haar face cascade and only run MTCNN on frames
+# where it finds a candidate. Set to 0 to run MTCNN on every frame.
+FACE_DETECTION_PREFILTER = os.environ.get('FACE_DETECTION_PREFILTER', '1') == '1'
+
+# Optional ONNX export of the face feature extractor. When the file exists it is
+# run with ONNX Runtime on the best available provider (TensorRT, CUDA, then CPU)
+# instead of building the Keras model.
+FACE_FEATURES_ONNX_MODEL = os.environ.get('FACE_FEATURES_ONNX_MODEL', os.path.join(MODEL_DIR, 'face_features.onnx'))
+
+# On CPU-only hosts the ONNX model is dynamically quantized to INT8 once (saved
+# next to it as *.int8.onnx) and run on a limited number of threads, leaving
+# cores free for capture and encoding.
+FACE_FEATURES_ONNX_QUANTIZE = os.environ.get('FACE_FEATURES_ONNX_QUANTIZE', '1') == '1'
+FACE_FEATURES_ONNX_THREADS = int(os.environ.get('FACE_FEATURES_ONNX_THREADS', 2))
+
+# Backbone of the face feature extractor: 'resnet50' or 'mobilenet_v2' (alpha 0.5,
+# much cheaper on CPU). An ONNX export should be made from the same backbone, as
+# its input preprocessing is chosen from this setting.
+FACE_FEATURES_BACKBONE = os.environ.get('FACE_FEATURES_BACKBONE', 'resnet50')
+
+# Maximum feature distance at which a face matches a known face. The default is
+# calibrated for resnet50; recalibrate it when switching backbones, as each one
+# has its own embedding space and distance scale.
+FACE_RECOGNITION_THRESHOLD = float(os.environ.get('FACE_RECOGNITION_THRESHOLD', 7))
+
+# Side length of the square face crops fed to the feature extractor. An ONNX model
+# with a fixed input size overrides this.
+FACE_FEATURES_INPUT_SIZE = int(os.environ.get('FACE_FEATURES_INPUT_SIZE',
+                                              160 if FACE_FEATURES_BACKBONE == 'mobilenet_v2' else 224))
+
+# Camera app messages go to the console. Per-frame messages are logged at DEBUG,
+# so they cost nothing unless CAMERA_LOG_LEVEL=DEBUG is set.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'camera': {
+            'handlers': ['console'],
+            'level': os.environ.get('CAMERA_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'